@@ -9,9 +9,11 @@
 
 from __future__ import annotations, unicode_literals
 from builtins import object, range, str
-from collections import namedtuple
+from collections import defaultdict, namedtuple
 from past.builtins import basestring
+from sys import intern
 from typing import TYPE_CHECKING
+from weakref import WeakValueDictionary
 
 from .exceptions import HplSanityError, HplTypeError
 
@@ -25,13 +27,26 @@ if TYPE_CHECKING:
 
 INF = float("inf")
 
+# empty set of variable names or aliases, shared by reference summaries
+_NO_NAMES = frozenset()
+
 
 ###############################################################################
 # Helper Functions
 ###############################################################################
 
-def isclose(a, b, rel_tol=1e-06, abs_tol=0.0):
-    return abs(a-b) <= max(rel_tol * max(abs(a), abs(b)), abs_tol)
+def quantize_time(t):
+    # seconds (float) -> microseconds (int), for equality and hashing
+    return t if t == INF else int(round(t * 1e6))
+
+def intern_name(name):
+    # parsers may hand over `str` subclasses (e.g., tokens),
+    # which `sys.intern` does not accept
+    return None if name is None else intern(str(name))
+
+def _intern_keys(table):
+    # so that names interned by the constructors are the keys themselves
+    return {intern(key): value for key, value in table.items()}
 
 RosNameMap = namedtuple("RosNameMap", ("msg",))
 
@@ -41,64 +56,50 @@ RosNameMap = namedtuple("RosNameMap", ("msg",))
 ###############################################################################
 
 class HplAstObject(object):
+    __slots__ = ()
 
-    def accept(self, visitor: HplAstVisitor) -> None:
-        visitor.visit_hpl_ast_object(self)
-
-    @property
-    def is_specification(self):
-        return False
-
-    @property
-    def is_property(self):
-        return False
-
-    @property
-    def is_scope(self):
-        return False
-
-    @property
-    def is_pattern(self):
-        return False
-
-    @property
-    def is_event(self):
-        return False
+    _VISIT_METHOD = "visit_hpl_ast_object"
 
-    @property
-    def is_predicate(self):
-        return False
+    is_specification = False
+    is_property = False
+    is_scope = False
+    is_pattern = False
+    is_event = False
+    is_predicate = False
+    is_expression = False
 
-    @property
-    def is_expression(self):
-        return False
+    def accept(self, visitor: HplAstVisitor) -> None:
+        getattr(visitor, self._VISIT_METHOD)(self)
 
     def children(self):
         return ()
 
     def iterate(self):
+        # pre-order, with an explicit stack (no recursion)
         stack = [self]
         while stack:
             obj = stack.pop()
-            stack.extend(reversed(obj.children()))
+            stack.extend(obj._children_reversed())
             yield obj
 
+    def _children_reversed(self):
+        return self.children()[::-1]
+
     def clone(self):
         raise NotImplementedError()
 
 
 class HplSpecification(HplAstObject):
-    __slots__ = ("properties",)
+    __slots__ = ("properties", "_hash", "_prop_set")
 
-    def accept(self, visitor: HplAstVisitor) -> None:
-        visitor.visit_hpl_specification(self)
+    _VISIT_METHOD = "visit_hpl_specification"
 
-    def __init__(self, props):
-        self.properties = props  # [HplProperty]
+    is_specification = True
 
-    @property
-    def is_specification(self):
-        return True
+    def __init__(self, props):
+        self.properties = tuple(props)  # (HplProperty)
+        self._hash = None
+        self._prop_set = None
 
     def children(self):
         return self.properties
@@ -110,13 +111,24 @@ class HplSpecification(HplAstObject):
     def clone(self):
         return HplSpecification([p.clone() for p in self.properties])
 
+    def _property_set(self):
+        if self._prop_set is None:
+            self._prop_set = frozenset(self.properties)
+        return self._prop_set
+
     def __eq__(self, other):
+        if self is other:
+            return True
         if not isinstance(other, HplSpecification):
             return False
-        return set(self.properties) == set(other.properties)
+        if hash(self) != hash(other):
+            return False
+        return self._property_set() == other._property_set()
 
     def __hash__(self):
-        return hash(set(self.properties))
+        if self._hash is None:
+            self._hash = hash(self._property_set())
+        return self._hash
 
     def __str__(self):
         return "\n".join(str(prop) for prop in self.properties)
@@ -126,27 +138,25 @@ class HplSpecification(HplAstObject):
 
 
 class HplProperty(HplAstObject):
-    __slots__ = ("scope", "pattern", "metadata")
+    __slots__ = ("scope", "pattern", "metadata", "is_safety", "is_liveness",
+                 "_events", "_simple_events", "_hash")
 
-    def accept(self, visitor: HplAstVisitor) -> None:
-        visitor.visit_hpl_property(self)
+    _VISIT_METHOD = "visit_hpl_property"
+
+    is_property = True
 
     def __init__(self, scope, pattern, meta=None):
         self.scope = scope # HplScope
         self.pattern = pattern # HplPattern
         self.metadata = meta if meta is not None else {}
-
-    @property
-    def is_property(self):
-        return True
-
-    @property
-    def is_safety(self):
-        return self.pattern.is_safety
-
-    @property
-    def is_liveness(self):
-        return self.pattern.is_liveness
+        self.is_safety = pattern.is_safety # bool
+        self.is_liveness = pattern.is_liveness # bool
+        self._events = tuple(e for e in (scope.activator, pattern.behaviour,
+                                         pattern.trigger, scope.terminator)
+                             if e is not None)
+        self._simple_events = tuple(se for e in self._events
+                                    for se in e.simple_events())
+        self._hash = None
 
     @property
     def uid(self):
@@ -156,41 +166,28 @@ class HplProperty(HplAstObject):
         return (self.scope, self.pattern)
 
     def is_fully_typed(self):
-        for event in self.events():
-            for e in event.simple_events():
-                if not e.predicate.is_fully_typed():
-                    return False
+        for e in self._simple_events:
+            if not e.predicate.is_fully_typed():
+                return False
         return True
 
     def refine_types(self, rostypes, aliases=None):
         # rostypes: string (topic) -> ROS Type Token
         # aliases:  string (alias) -> ROS Type Token
-        for event in self.events():
-            for e in event.simple_events():
-                rostype = rostypes.get(e.topic)
-                if rostype is None:
-                    raise HplTypeError.undefined(e.topic)
-                e.refine_types(rostype, aliases=aliases)
+        for e in self._simple_events:
+            rostype = rostypes.get(e.topic)
+            if rostype is None:
+                raise HplTypeError.undefined(e.topic)
+            e.refine_types(rostype, aliases=aliases)
 
     def events(self):
-        if self.scope.activator is not None:
-            yield self.scope.activator
-        yield self.pattern.behaviour
-        if self.pattern.trigger is not None:
-            yield self.pattern.trigger
-        if self.scope.terminator is not None:
-            yield self.scope.terminator
+        return self._events
 
     def get_rosname_map(self):
         m = RosNameMap({})
-        for event in self.events():
-            for e in event.simple_events():
-                if e.is_publish:
-                    s = m.msg.get(e.topic)
-                    if s is None:
-                        s = []
-                        m.msg[e.topic] = s
-                    s.append(e)
+        for e in self._simple_events:
+            if e.is_publish:
+                m.msg.setdefault(e.topic, []).append(e)
         return m
 
     def sanity_check(self):
@@ -218,8 +215,8 @@ class HplProperty(HplAstObject):
             if refs:
                 raise HplSanityError(
                     "references to undefined events: " + repr(refs))
-            return p.aliases()
-        return ()
+            return frozenset(p.aliases())
+        return frozenset()
 
     def _check_trigger(self, available):
         a = self.pattern.trigger
@@ -227,14 +224,14 @@ class HplProperty(HplAstObject):
         self._check_refs_defined(a.external_references(), available)
         aliases = a.aliases()
         self._check_duplicates(aliases, available)
-        return aliases + available
+        return available.union(aliases)
 
     def _check_behaviour(self, available):
         b = self.pattern.behaviour
         self._check_refs_defined(b.external_references(), available)
         aliases = b.aliases()
         self._check_duplicates(aliases, available)
-        return aliases + available
+        return available.union(aliases)
 
     def _check_terminator(self, available):
         q = self.scope.terminator
@@ -243,12 +240,16 @@ class HplProperty(HplAstObject):
             self._check_duplicates(q.aliases(), available)
 
     def _check_refs_defined(self, refs, available):
-        for ref in refs:
-            if not ref in available:
-                raise HplSanityError(
-                    "reference to undefined event: " + repr(ref))
+        # available: frozenset of aliases
+        undefined = refs.difference(available)
+        if undefined:
+            raise HplSanityError(
+                "reference to undefined event: " + repr(undefined.pop()))
 
     def _check_duplicates(self, aliases, available):
+        # available: frozenset of aliases
+        if available.isdisjoint(aliases):
+            return
         for alias in aliases:
             if alias in available:
                 raise HplSanityError("duplicate alias: " + repr(alias))
@@ -259,7 +260,9 @@ class HplProperty(HplAstObject):
         return self.pattern == other.pattern and self.scope == other.scope
 
     def __hash__(self):
-        return 31 * hash(self.scope) + hash(self.pattern)
+        if self._hash is None:
+            self._hash = 31 * hash(self.scope) + hash(self.pattern)
+        return self._hash
 
     def __str__(self):
         return "{}: {}".format(self.scope, self.pattern)
@@ -270,41 +273,54 @@ class HplProperty(HplAstObject):
 
 
 class HplScope(HplAstObject):
-    __slots__ = ("scope_type", "activator", "terminator")
+    __slots__ = ("scope_type", "activator", "terminator",
+                 "_children", "_children_rev", "_hash")
 
     GLOBAL = 1
     AFTER_UNTIL = 2
     AFTER = 3
     UNTIL = 4
 
-    def accept(self, visitor: HplAstVisitor) -> None:
-        visitor.visit_hpl_scope(self)
+    # scope type: string format, allows activator, allows terminator
+    _SCOPES = {
+        GLOBAL: ("globally", False, False),
+        AFTER_UNTIL: ("after {p} until {q}", True, True),
+        AFTER: ("after {p}", True, False),
+        UNTIL: ("until {q}", False, True),
+    }
+
+    _VISIT_METHOD = "visit_hpl_scope"
+
+    # global scopes have no events, and thus no mutable state, so all
+    # properties can share a single instance (per class)
+    _HCONS = {}
+
+    is_scope = True
 
     def __init__(self, scope, activator=None, terminator=None):
-        if scope == self.GLOBAL:
-            if activator is not None:
-                raise ValueError(activator)
-            if terminator is not None:
-                raise ValueError(terminator)
-        elif scope == self.AFTER:
-            if terminator is not None:
-                raise ValueError(terminator)
-        elif scope == self.UNTIL:
-            if activator is not None:
-                raise ValueError(activator)
-        elif scope != self.AFTER_UNTIL:
+        rules = self._SCOPES.get(scope)
+        if rules is None:
             raise ValueError(scope)
+        _, has_activator, has_terminator = rules
+        if not has_activator and activator is not None:
+            raise ValueError(activator)
+        if not has_terminator and terminator is not None:
+            raise ValueError(terminator)
         self.scope_type = scope
         self.activator = activator # HplEvent | None
         self.terminator = terminator # HplEvent | None
-
-    @property
-    def is_scope(self):
-        return True
+        self._children = tuple(e for e in (activator, terminator)
+                               if e is not None)
+        self._children_rev = self._children[::-1]
+        self._hash = None
 
     @classmethod
     def globally(cls):
-        return cls(cls.GLOBAL)
+        scope = cls._HCONS.get(cls)
+        if scope is None:
+            scope = cls(cls.GLOBAL)
+            cls._HCONS[cls] = scope
+        return scope
 
     @classmethod
     def after(cls, activator):
@@ -335,15 +351,14 @@ class HplScope(HplAstObject):
         return self.scope_type == self.AFTER_UNTIL
 
     def children(self):
-        if self.activator is None and self.terminator is None:
-            return ()
-        if self.activator is None:
-            return (self.terminator,)
-        if self.terminator is None:
-            return (self.activator,)
-        return (self.activator, self.terminator)
+        return self._children
+
+    def _children_reversed(self):
+        return self._children_rev
 
     def clone(self):
+        if self.scope_type == self.GLOBAL:
+            return self
         p = None if self.activator is None else self.activator.clone()
         q = None if self.terminator is None else self.terminator.clone()
         return HplScope(self.scope_type, activator=p, terminator=q)
@@ -356,20 +371,15 @@ class HplScope(HplAstObject):
                 and self.terminator == other.terminator)
 
     def __hash__(self):
-        h = 31 * hash(self.scope_type) + hash(self.activator)
-        h = 31 * h + hash(self.terminator)
-        return h
+        if self._hash is None:
+            h = 31 * hash(self.scope_type) + hash(self.activator)
+            h = 31 * h + hash(self.terminator)
+            self._hash = h
+        return self._hash
 
     def __str__(self):
-        if self.scope_type == self.GLOBAL:
-            return "globally"
-        if self.scope_type == self.AFTER:
-            return "after {}".format(self.activator)
-        if self.scope_type == self.UNTIL:
-            return "until {}".format(self.terminator)
-        if self.scope_type == self.AFTER_UNTIL:
-            return "after {} until {}".format(self.activator, self.terminator)
-        assert False, "unexpected scope type"
+        fmt = self._SCOPES[self.scope_type][0]
+        return fmt.format(p=self.activator, q=self.terminator)
 
     def __repr__(self):
         return "{}({}, activator={}, terminator={})".format(
@@ -379,7 +389,8 @@ class HplScope(HplAstObject):
 
 class HplPattern(HplAstObject):
 
-    __slots__ = ("pattern_type", "behaviour", "trigger", "min_time", "max_time")
+    __slots__ = ("pattern_type", "behaviour", "trigger", "min_time", "max_time",
+                 "_children", "_children_rev", "_hash")
 
     EXISTENCE = 1
     ABSENCE = 2
@@ -387,25 +398,36 @@ class HplPattern(HplAstObject):
     REQUIREMENT = 4
     PREVENTION = 5
 
-    def accept(self, visitor: HplAstVisitor) -> None:
-        visitor.visit_hpl_pattern(self)
+    # pattern type: string format, allows trigger
+    _PATTERNS = {
+        EXISTENCE: ("some {b}{t}", False),
+        ABSENCE: ("no {b}{t}", False),
+        RESPONSE: ("{a} causes {b}{t}", True),
+        REQUIREMENT: ("{b} requires {a}{t}", True),
+        PREVENTION: ("{a} forbids {b}{t}", True),
+    }
+
+    _VISIT_METHOD = "visit_hpl_pattern"
+
+    is_pattern = True
 
     def __init__(self, pattern, behaviour, trigger, min_time=0.0, max_time=INF):
-        if pattern == self.EXISTENCE or pattern == self.ABSENCE:
-            if trigger is not None:
-                raise ValueError(trigger)
-        elif (pattern != self.RESPONSE and pattern != self.REQUIREMENT
-                and pattern != self.PREVENTION):
+        rules = self._PATTERNS.get(pattern)
+        if rules is None:
             raise ValueError(pattern)
+        if not rules[1] and trigger is not None:
+            raise ValueError(trigger)
         self.pattern_type = pattern
         self.behaviour = behaviour # HplEvent
         self.trigger = trigger # HplEvent | None
         self.min_time = min_time
         self.max_time = max_time
-
-    @property
-    def is_pattern(self):
-        return True
+        if trigger is None:
+            self._children = (behaviour,)
+        else:
+            self._children = (trigger, behaviour)
+        self._children_rev = self._children[::-1]
+        self._hash = None
 
     @classmethod
     def existence(cls, behaviour, min_time=0.0, max_time=INF):
@@ -472,9 +494,10 @@ class HplPattern(HplAstObject):
         return self.max_time >= 0.0 and self.max_time < INF
 
     def children(self):
-        if self.trigger is None:
-            return (self.behaviour,)
-        return (self.trigger, self.behaviour)
+        return self._children
+
+    def _children_reversed(self):
+        return self._children_rev
 
     def clone(self):
         b = self.behaviour.clone()
@@ -488,32 +511,26 @@ class HplPattern(HplAstObject):
         return (self.pattern_type == other.pattern_type
                 and self.behaviour == other.behaviour
                 and self.trigger == other.trigger
-                and isclose(self.min_time, other.min_time)
-                and ((self.max_time == INF and other.max_time == INF)
-                    or isclose(self.max_time, other.max_time)))
+                and (quantize_time(self.min_time)
+                     == quantize_time(other.min_time))
+                and (quantize_time(self.max_time)
+                     == quantize_time(other.max_time)))
 
     def __hash__(self):
-        h = 31 * hash(self.pattern_type) + hash(self.behaviour)
-        h = 31 * h + hash(self.trigger)
-        h = 31 * h + hash(self.min_time)
-        h = 31 * h + hash(self.max_time)
-        return h
+        if self._hash is None:
+            h = 31 * hash(self.pattern_type) + hash(self.behaviour)
+            h = 31 * h + hash(self.trigger)
+            h = 31 * h + hash(quantize_time(self.min_time))
+            h = 31 * h + hash(quantize_time(self.max_time))
+            self._hash = h
+        return self._hash
 
     def __str__(self):
         t = ""
         if self.max_time < INF:
             t = " within {}s".format(self.max_time)
-        if self.pattern_type == self.EXISTENCE:
-            return "some {}{}".format(self.behaviour, t)
-        if self.pattern_type == self.ABSENCE:
-            return "no {}{}".format(self.behaviour, t)
-        if self.pattern_type == self.RESPONSE:
-            return "{} causes {}{}".format(self.trigger, self.behaviour, t)
-        if self.pattern_type == self.REQUIREMENT:
-            return "{} requires {}{}".format(self.behaviour, self.trigger, t)
-        if self.pattern_type == self.PREVENTION:
-            return "{} forbids {}{}".format(self.trigger, self.behaviour, t)
-        assert False, "unexpected observable pattern"
+        fmt = self._PATTERNS[self.pattern_type][0]
+        return fmt.format(a=self.trigger, b=self.behaviour, t=t)
 
     def __repr__(self):
         return "{}({}, {}, {}, min_time={}, max_time={})".format(
@@ -526,21 +543,13 @@ class HplPattern(HplAstObject):
 ###############################################################################
 
 class HplEvent(HplAstObject):
+    __slots__ = ()
 
-    def accept(self, visitor: HplAstVisitor) -> None:
-        visitor.visit_hpl_event(self)
-
-    @property
-    def is_event(self):
-        return True
-
-    @property
-    def is_simple_event(self):
-        return False
+    _VISIT_METHOD = "visit_hpl_event"
 
-    @property
-    def is_event_disjunction(self):
-        return False
+    is_event = True
+    is_simple_event = False
+    is_event_disjunction = False
 
     def aliases(self):
         return ()
@@ -556,12 +565,14 @@ class HplEvent(HplAstObject):
 
 
 class HplSimpleEvent(HplEvent):
-    __slots__ = ("event_type", "predicate", "topic", "alias", "msg_type")
+    __slots__ = ("event_type", "predicate", "topic", "alias", "msg_type",
+                 "_hash")
 
     PUBLISH = 1
 
-    def accept(self, visitor: HplAstVisitor) -> None:
-        visitor.visit_hpl_simple_event(self)
+    _VISIT_METHOD = "visit_hpl_simple_event"
+
+    is_simple_event = True
 
     def __init__(self, event_type, predicate, topic, msg_type=None, alias=None):
         if event_type != self.PUBLISH:
@@ -570,16 +581,13 @@ class HplSimpleEvent(HplEvent):
             raise TypeError("not a predicate: " + str(predicate))
         self.event_type = event_type
         self.predicate = predicate # HplExpression
-        self.topic = topic # string
-        self.alias = alias # string
+        self.topic = intern_name(topic) # string
+        self.alias = intern_name(alias) # string
         self.msg_type = msg_type # ROS Type Token
+        self._hash = None
         if alias:
             predicate.replace_self_reference(alias)
 
-    @property
-    def is_simple_event(self):
-        return True
-
     @classmethod
     def publish(cls, topic, msg_type=None, predicate=None, alias=None):
         if predicate is None:
@@ -607,12 +615,7 @@ class HplSimpleEvent(HplEvent):
         return (self.alias,)
 
     def external_references(self):
-        refs = set()
-        for obj in self.predicate.iterate():
-            if obj.is_expression and obj.is_accessor:
-                if obj.is_field and obj.message.is_value:
-                    if obj.message.is_variable:
-                        refs.add(obj.message.name)
+        refs = self.predicate.external_references()
         if self.alias is not None:
             refs.discard(self.alias)
         return refs
@@ -646,8 +649,10 @@ class HplSimpleEvent(HplEvent):
                 and self.msg_type == other.msg_type)
 
     def __hash__(self):
-        h = 31 * hash(self.event_type) + hash(self.predicate)
-        return 31 * h + hash(self.topic)
+        if self._hash is None:
+            h = 31 * hash(self.event_type) + hash(self.predicate)
+            self._hash = 31 * h + hash(self.topic)
+        return self._hash
 
     def __str__(self):
         alias = (" as " + self.alias) if self.alias is not None else ""
@@ -668,12 +673,13 @@ class HplSimpleEvent(HplEvent):
 
 
 class HplEventDisjunction(HplEvent):
-    __slots__ = ("event1", "event2")
+    __slots__ = ("event1", "event2", "_simple_events", "_topics", "_hash")
 
     _DUP = "topic '{}' appears multiple times in an event disjunction"
 
-    def accept(self, visitor: HplAstVisitor) -> None:
-        visitor.visit_hpl_event_disjunction(self)
+    _VISIT_METHOD = "visit_hpl_event_disjunction"
+
+    is_event_disjunction = True
 
     def __init__(self, event1, event2):
         if not event1.is_event:
@@ -682,12 +688,9 @@ class HplEventDisjunction(HplEvent):
             raise TypeError("not an event: " + str(event2))
         self.event1 = event1 # HplEvent
         self.event2 = event2 # HplEvent
+        self._hash = None
         self._check_unique_topics()
 
-    @property
-    def is_event_disjunction(self):
-        return True
-
     @property
     def events(self):
         return (self.event1, self.event2)
@@ -707,35 +710,30 @@ class HplEventDisjunction(HplEvent):
                 or self.event2.contains_reference(alias))
 
     def simple_events(self):
-        if self.event1.is_simple_event:
-            yield self.event1
-        else:
-            for event in self.event1.simple_events():
-                yield event
-        if self.event2.is_simple_event:
-            yield self.event2
-        else:
-            for event in self.event2.simple_events():
-                yield event
+        return iter(self._simple_events)
 
     def clone(self):
         return HplEventDisjunction(self.event1.clone(), self.event2.clone())
 
     def _check_unique_topics(self):
-        topics = set()
-        pending = [self.event1, self.event2]
-        while pending:
-            event = pending.pop()
+        # nested disjunctions have already checked their own events,
+        # so only topics across both sides can clash
+        sides = []
+        for event in (self.event1, self.event2):
             if event.is_event_disjunction:
-                pending.append(event.event1)
-                pending.append(event.event2)
+                sides.append((event._simple_events, event._topics))
             elif event.is_simple_event:
                 assert event.is_publish
-                if event.topic in topics:
-                    raise HplSanityError(self._DUP.format(event.topic))
-                topics.add(event.topic)
+                sides.append(((event,), frozenset((event.topic,))))
             else:
                 assert False, "unknown event type"
+        (events1, topics1), (events2, topics2) = sides
+        if not topics1.isdisjoint(topics2):
+            for event in events2:
+                if event.topic in topics1:
+                    raise HplSanityError(self._DUP.format(event.topic))
+        self._simple_events = events1 + events2 # (HplSimpleEvent)
+        self._topics = topics1 | topics2
 
     def __eq__(self, other):
         if not isinstance(other, HplEventDisjunction):
@@ -746,7 +744,9 @@ class HplEventDisjunction(HplEvent):
                     and self.event2 == other.event1))
 
     def __hash__(self):
-        return 31 * hash(self.event1) + 31 * hash(self.event2)
+        if self._hash is None:
+            self._hash = 31 * hash(self.event1) + 31 * hash(self.event2)
+        return self._hash
 
     def __str__(self):
         return "({} or {})".format(self.event1, self.event2)
@@ -761,37 +761,38 @@ class HplEventDisjunction(HplEvent):
 ###############################################################################
 
 class HplPredicate(HplAstObject):
-    __slots__ = ("condition",)
+    __slots__ = ("condition", "_hash", "_accessors", "_fully_typed")
 
     _DIFF_TYPES = ("multiple occurrences of '{}' with incompatible types: "
                    "found ({}) and ({})")
     _NO_REFS = "there are no references to any fields of this message"
 
+    _VISIT_METHOD = "visit_hpl_predicate"
+
+    is_predicate = True
+    is_vacuous = False
+
     def __init__(self, expr):
         if not expr.is_expression:
             raise TypeError("not an expression: " + str(expr))
         if not expr.can_be_bool:
             raise HplTypeError("not a boolean expression: " + str(expr))
         self.condition = expr
+        self._hash = None
+        self._accessors = () # outermost accessors, in pre-order
+        self._fully_typed = False
         self._static_checks()
 
-    def accept(self, visitor: HplAstVisitor) -> None:
-        visitor.visit_hpl_predicate(self)
-
-    @property
-    def is_predicate(self):
-        return True
-
-    @property
-    def is_vacuous(self):
-        return False
-
     @property
     def phi(self):
         return self.condition
 
     def is_fully_typed(self):
-        return self.condition.is_fully_typed()
+        # types are only ever narrowed, and new message references are
+        # cast to T_MSG, so once fully typed it stays fully typed
+        if not self._fully_typed:
+            self._fully_typed = self.condition.is_fully_typed()
+        return self._fully_typed
 
     def children(self):
         return (self.condition,)
@@ -804,8 +805,7 @@ class HplPredicate(HplAstObject):
     def join(self, other):
         if other.is_vacuous:
             return self if other.is_true else other
-        expr = HplBinaryOperator("and", self.condition, other.condition)
-        return HplPredicate(expr)
+        return HplPredicate(And(self.condition, other.condition))
 
     def external_references(self):
         return self.condition.external_references()
@@ -817,28 +817,21 @@ class HplPredicate(HplAstObject):
         # rostype: ROS Type Token
         # aliases: string (alias) -> ROS Type Token
         aliases = aliases if aliases is not None else {}
-        stack = [self.condition]
-        while stack:
-            obj = stack.pop()
-            if obj.is_accessor:
-                self._refine_type(obj, rostype, aliases)
-            else:
-                stack.extend(reversed(obj.children()))
+        flags = {} # id(ROS Type Token) -> T_* flag
+        for obj in self._accessors:
+            self._refine_type(obj, rostype, aliases, flags)
 
     def replace_self_reference(self, alias):
-        for obj in self.iterate():
-            if obj.is_expression and obj.is_accessor:
-                if obj.is_field and obj.message.is_value:
-                    if obj.message.is_variable:
-                        if obj.message.name == alias:
-                            msg = HplThisMessage()
-                            obj.message = msg
-                            obj._type_check(msg, T_MSG)
+        for obj in self.condition._references()[1]:
+            if obj.message.is_variable and obj.message.name == alias:
+                msg = HplThisMessage()
+                obj.message = msg
+                obj._type_check(msg, T_MSG)
 
     def clone(self):
         return HplPredicate(self.condition.clone())
 
-    def _refine_type(self, accessor, rostype, aliases):
+    def _refine_type(self, accessor, rostype, aliases, flags):
         stack = [accessor]
         expr = accessor.message
         while expr.is_accessor:
@@ -847,26 +840,32 @@ class HplPredicate(HplAstObject):
         assert expr.is_value and (expr.is_this_msg or expr.is_variable)
         if expr.is_this_msg:
             t = rostype
+            assert t.is_message
+            if expr.ros_type is not t:
+                # shared instances; swap in the one for `t`
+                root = stack[-1]
+                msg = HplThisMessage(t)
+                root._set_children((msg,))
         else:
             if expr.name not in aliases:
                 raise HplSanityError(
                     "undefined message alias: '{}'".format(expr.name))
             t = aliases[expr.name]
-        assert t.is_message
-        expr.ros_type = t
+            assert t.is_message
+            expr.ros_type = t
         while stack:
             expr = stack.pop()
             if expr.is_field:
-                if not (t.is_message or expr.field in t.fields
-                        or expr.field in t.constants):
+                if not t.is_message:
                     raise HplTypeError.ros_field(t, expr.field, expr)
-                if expr.field in t.fields:
-                    t = t.fields[expr.field]
+                field_type = t.fields.get(expr.field)
+                if field_type is not None:
+                    t = field_type
                 else:
-                    assert expr.field in t.constants, \
-                        "'{}' not in {} or {}".format(
-                            expr.field, t.fields, t.constants)
-                    t = t.constants[expr.field].ros_type
+                    constant = t.constants.get(expr.field)
+                    if constant is None:
+                        raise HplTypeError.ros_field(t, expr.field, expr)
+                    t = constant.ros_type
             else:
                 assert expr.is_indexed
                 if not t.is_array:
@@ -876,29 +875,35 @@ class HplPredicate(HplAstObject):
                         and not t.contains_index(i.value)):
                     raise HplTypeError.ros_index(t, expr.index, expr)
                 t = t.type_token
-            if t.is_message:
-                accessor._type_check(expr, T_MSG)
-            elif t.is_array:
-                accessor._type_check(expr, T_ARR)
-            elif t.is_number:
-                accessor._type_check(expr, T_NUM)
-                # TODO check that values fit within types
-            elif t.is_bool:
-                accessor._type_check(expr, T_BOOL)
-            elif t.is_string:
-                accessor._type_check(expr, T_STR)
+            f = flags.get(id(t))
+            if f is None:
+                f = ros_type_flag(t)
+                flags[id(t)] = f
+            if f:
+                # TODO check that values fit within number types
+                accessor._type_check(expr, f)
             expr.ros_type = t
 
     def _static_checks(self):
-        ref_table = {}
-        for obj in self.condition.iterate():
-            if obj.is_accessor or (obj.is_value and obj.is_variable):
-                key = str(obj)
-                refs = ref_table.get(key)
-                if refs is None:
-                    refs = []
-                    ref_table[key] = refs
-                refs.append(obj)
+        # single pass over the condition, in pre-order;
+        # references are grouped by structural equality (`__eq__`/`__hash__`),
+        # except variables, which are keyed by their (interned) token, as
+        # that is what their equality amounts to
+        ref_table = defaultdict(list)
+        accessors = []
+        stack = [(self.condition, False)]
+        while stack:
+            obj, nested = stack.pop()
+            if obj.is_accessor:
+                ref_table[obj].append(obj)
+                if not nested:
+                    accessors.append(obj)
+                nested = True
+            elif obj.is_value and obj.is_variable:
+                ref_table[obj.token].append(obj)
+            for child in obj._children_reversed():
+                stack.append((child, nested))
+        self._accessors = tuple(accessors)
         self._all_refs_same_type(ref_table)
         self._some_field_refs(ref_table)
 
@@ -938,7 +943,9 @@ class HplPredicate(HplAstObject):
         return self.condition == other.condition
 
     def __hash__(self):
-        return hash(self.condition)
+        if self._hash is None:
+            self._hash = hash(self.condition)
+        return self._hash
 
     def __str__(self):
         return "{{ {} }}".format(self.condition)
@@ -950,20 +957,19 @@ class HplPredicate(HplAstObject):
 class HplVacuousTruth(HplAstObject):
     __slots__ = ()
 
-    def accept(self, visitor: HplAstVisitor) -> None:
-        visitor.visit_hpl_vacuous_truth(self)
-
-    @property
-    def is_predicate(self):
-        return True
+    _VISIT_METHOD = "visit_hpl_vacuous_truth"
 
-    @property
-    def is_vacuous(self):
-        return True
+    is_predicate = True
+    is_vacuous = True
+    is_true = True
 
-    @property
-    def is_true(self):
-        return True
+    def __new__(cls):
+        # stateless, so all instances of a class can be the same object
+        instance = cls.__dict__.get("_INSTANCE")
+        if instance is None:
+            instance = super(HplVacuousTruth, cls).__new__(cls)
+            cls._INSTANCE = instance
+        return instance
 
     def is_fully_typed(self):
         return True
@@ -987,10 +993,10 @@ class HplVacuousTruth(HplAstObject):
         pass
 
     def clone(self):
-        return HplVacuousTruth()
+        return self
 
     def __eq__(self, other):
-        return isinstance(other, HplVacuousTruth)
+        return self is other or isinstance(other, HplVacuousTruth)
 
     def __hash__(self):
         return 27644437
@@ -1005,20 +1011,19 @@ class HplVacuousTruth(HplAstObject):
 class HplContradiction(HplAstObject):
     __slots__ = ()
 
-    def accept(self, visitor: HplAstVisitor) -> None:
-        visitor.visit_hpl_contradiction(self)
-
-    @property
-    def is_predicate(self):
-        return True
+    _VISIT_METHOD = "visit_hpl_contradiction"
 
-    @property
-    def is_vacuous(self):
-        return True
+    is_predicate = True
+    is_vacuous = True
+    is_true = False
 
-    @property
-    def is_true(self):
-        return False
+    def __new__(cls):
+        # stateless, so all instances of a class can be the same object
+        instance = cls.__dict__.get("_INSTANCE")
+        if instance is None:
+            instance = super(HplContradiction, cls).__new__(cls)
+            cls._INSTANCE = instance
+        return instance
 
     def is_fully_typed(self):
         return True
@@ -1042,10 +1047,10 @@ class HplContradiction(HplAstObject):
         pass
 
     def clone(self):
-        return HplContradiction()
+        return self
 
     def __eq__(self, other):
-        return isinstance(other, HplContradiction)
+        return self is other or isinstance(other, HplContradiction)
 
     def __hash__(self):
         return 65537
@@ -1094,7 +1099,32 @@ _TYPE_NAMES = {
     T_MSG: "ROS msg",
 }
 
-def type_name(t):
+# masks with exactly one type flag on
+_SINGLE_TYPES = frozenset(_TYPE_NAMES)
+
+# exact Python type of a literal value -> T_* flag
+_LITERAL_TYPES = {
+    bool: T_BOOL,
+    int: T_NUM,
+    float: T_NUM,
+    str: T_STR,
+}
+
+def ros_type_flag(rostype):
+    # ROS Type Token -> T_* flag (0 if it has no corresponding type)
+    if rostype.is_message:
+        return T_MSG
+    if rostype.is_array:
+        return T_ARR
+    if rostype.is_number:
+        return T_NUM
+    if rostype.is_bool:
+        return T_BOOL
+    if rostype.is_string:
+        return T_STR
+    return 0
+
+def _join_type_names(t):
     if t in _TYPE_NAMES:
         return _TYPE_NAMES[t]
     ns = []
@@ -1103,43 +1133,33 @@ def type_name(t):
             ns.append(name)
     return " or ".join(ns)
 
+# type mask -> name, for every possible mask
+_TYPE_NAME_TABLE = tuple(_join_type_names(t) for t in range(T_ANY + 1))
+
+def type_name(t):
+    return _TYPE_NAME_TABLE[t]
+
 
 ###############################################################################
 # Expressions
 ###############################################################################
 
 class HplExpression(HplAstObject):
-    __slots__ = ("types",)
+    __slots__ = ("types", "_refs", "_children", "_children_rev")
 
-    def __init__(self, types=T_ANY):
-        self.types = types
+    _VISIT_METHOD = "visit_hpl_expression"
 
-    def accept(self, visitor: HplAstVisitor) -> None:
-        visitor.visit_hpl_expression(self)
+    is_expression = True
+    is_value = False
+    is_operator = False
+    is_function_call = False
+    is_quantifier = False
+    is_accessor = False
 
-    @property
-    def is_expression(self):
-        return True
-
-    @property
-    def is_value(self):
-        return False
-
-    @property
-    def is_operator(self):
-        return False
-
-    @property
-    def is_function_call(self):
-        return False
-
-    @property
-    def is_quantifier(self):
-        return False
-
-    @property
-    def is_accessor(self):
-        return False
+    def __init__(self, types=T_ANY):
+        self.types = types
+        self._refs = None
+        self._children = self._children_rev = ()
 
     @property
     def can_be_bool(self):
@@ -1172,10 +1192,65 @@ class HplExpression(HplAstObject):
     def can_be(self, t):
         return bool(self.types & t)
 
+    def children(self):
+        return self._children
+
+    def _children_reversed(self):
+        return self._children_rev
+
+    def _set_children(self, children):
+        # keeps the reversed tuple (for pre-order traversals) in sync
+        self._children = children
+        self._children_rev = children[::-1]
+
+    def clone(self):
+        # iterative post-order: every node is copied after its children,
+        # without going through `__init__`, as this tree is already checked
+        uids = {} # id(quantifier) -> id(copy)
+        variables = []
+        copies = []
+        stack = [(self, False)]
+        while stack:
+            expr, ready = stack.pop()
+            children = expr._children
+            if not children:
+                # leaves; literals and `HplThisMessage` are shared as is
+                copy = expr._copy(())
+                copies.append(copy)
+                if expr.is_value and expr.is_variable:
+                    variables.append(copy)
+                continue
+            if not ready:
+                stack.append((expr, True))
+                stack.extend((obj, False) for obj in expr._children_rev)
+                continue
+            n = len(copies) - len(children)
+            copy = expr._copy(tuple(copies[n:]))
+            del copies[n:]
+            copies.append(copy)
+            if expr.is_quantifier:
+                uids[id(expr)] = id(copy)
+            elif expr.is_value and expr.is_variable:
+                variables.append(copy)
+        # rebind variables to the copied quantifiers (unbound otherwise)
+        for var in variables:
+            var.defined_at = uids.get(var.defined_at)
+        return copies[0]
+
+    def _copy(self, children):
+        # shallow copy, with the given (copied) children;
+        # subclasses copy over the rest of their fields
+        cls = type(self)
+        expr = cls.__new__(cls)
+        expr.types = self.types
+        expr._refs = None # refers to the original field accesses
+        expr._children = children
+        expr._children_rev = children[::-1]
+        return expr
+
     def is_fully_typed(self):
         for obj in self.iterate():
-            t = obj.types
-            if (not t) or bool(t & (t - 1)): # not a power of 2
+            if obj.types not in _SINGLE_TYPES:
                 return False
         return True
 
@@ -1187,11 +1262,15 @@ class HplExpression(HplAstObject):
         self.types = r
 
     def _type_check(self, x, t):
-        try:
-            x.cast(t)
-        except HplTypeError as e:
-            msg = "Type error in expression '{}':\n{}".format(self, e)
-            raise HplTypeError(msg)
+        # same as `x.cast(t)`, without an exception frame on the happy path
+        r = x.types & t
+        if r:
+            x.types = r
+            return
+        raise HplTypeError(
+            "Type error in expression '{}':\n"
+            "expected ({}) but found ({}): {}".format(
+                self, type_name(t), type_name(x.types), x))
 
     def add_type(self, t):
         self.types = self.types | t
@@ -1203,59 +1282,115 @@ class HplExpression(HplAstObject):
 
     def external_references(self):
         refs = set()
-        for obj in self.iterate():
-            assert obj.is_expression
-            if obj.is_accessor:
-                if obj.is_field and obj.message.is_value:
-                    if obj.message.is_variable:
-                        refs.add(obj.message.name)
+        for obj in self._references()[1]:
+            if obj.message.is_variable:
+                refs.add(obj.message.name)
         return refs
 
     def contains_reference(self, alias):
         # alias = None: reference to `this msg`
         # alias != None: external reference
+        names, fields = self._references()
         if alias is None:
-            for obj in self.iterate():
-                assert obj.is_expression
-                if obj.is_value and obj.is_this_msg:
+            for obj in fields:
+                if obj.message.is_this_msg:
                     return True
-        else:
-            for obj in self.iterate():
-                assert obj.is_expression
-                if obj.is_value and obj.is_variable:
-                    if obj.name == alias:
-                        return True
+            return False
+        if alias in names:
+            return True
+        for obj in fields:
+            msg = obj.message
+            if msg.is_variable and msg.name == alias:
+                return True
         return False
 
+    def _references(self):
+        # -> (variable names, field accesses on a message reference)
+        # the messages of field accesses are read here, and not cached,
+        # as they are the only children that are replaced in place
+        names, fields = self._summary()
+        stack = list(fields)
+        if not stack:
+            return (names, fields)
+        fields = []
+        while stack:
+            obj = stack.pop()
+            msg = obj._children[0]
+            if msg.is_value:
+                fields.append(obj)
+                continue
+            more, nested = msg._summary()
+            if more:
+                names = more if not names else names | more
+            stack.extend(nested)
+        return (names, fields)
+
+    def _summary(self):
+        # -> (variable names, outermost field accesses), without looking
+        # into the messages of field accesses; immutable once computed
+        refs = self._refs
+        if refs is not None:
+            return refs
+        stack = [(self, False)]
+        while stack:
+            expr, ready = stack.pop()
+            if expr._refs is not None:
+                continue
+            leaf = not expr._children or (expr.is_accessor and expr.is_field)
+            if ready or leaf:
+                expr._refs = expr._collect_references()
+                continue
+            stack.append((expr, True))
+            stack.extend((obj, False) for obj in expr._children
+                         if obj._refs is None)
+        return self._refs
+
+    def _collect_references(self):
+        # from the children's summaries, which are already computed
+        names = _NO_NAMES
+        fields = ()
+        for obj in self._children:
+            refs = obj._refs
+            # share the children's results whenever there is nothing to merge
+            if refs[0]:
+                names = refs[0] if not names else names | refs[0]
+            if refs[1]:
+                fields = refs[1] if not fields else fields + refs[1]
+        return (names, fields)
+
 
 ###############################################################################
 # Quantifiers
 ###############################################################################
 
 class HplQuantifier(HplExpression):
-    __slots__ = HplExpression.__slots__ + (
-        "quantifier", "variable", "domain", "condition")
+    __slots__ = ("quantifier", "variable", "_hash")
 
     _SET_REF = "cannot reference quantified variable '{}' in the domain of:\n{}"
     _MULTI_DEF = "multiple definitions of variable '{}' in:\n{}"
     _UNUSED = "quantified variable '{}' is never used in:\n{}"
 
-    def accept(self, visitor: HplAstVisitor) -> None:
-        visitor.visit_hpl_quantifier(self)
+    _VISIT_METHOD = "visit_hpl_quantifier"
+
+    is_quantifier = True
 
     def __init__(self, qt, var, dom, p, shadow=False):
         HplExpression.__init__(self, types=T_BOOL)
-        self.quantifier = qt # string
-        self.variable = var # string
-        self.domain = dom # HplExpression
-        self.condition = p # HplExpression
+        self.quantifier = intern_name(qt) # string
+        self.variable = intern_name(var) # string
+        self._set_children((dom, p)) # (HplExpression, HplExpression)
+        self._hash = None
         self._type_check(dom, T_COMP)
         self._type_check(p, T_BOOL)
         self._check_variables(shadow)
 
     @property
-    def is_quantifier(self):
-        return True
+    def domain(self):
+        return self._children[0]
+
+    @property
+    def condition(self):
+        return self._children[1]
 
     @property
     def is_universal(self):
@@ -1285,14 +1420,11 @@ class HplQuantifier(HplExpression):
     def phi(self):
         return self.condition
 
-    def children(self):
-        return (self.domain, self.condition)
-
-    def clone(self):
-        expr = HplQuantifier(self.quantifier, self.variable,
-                             self.domain.clone(), self.condition.clone(),
-                             shadow=True)
-        expr.types = self.types
+    def _copy(self, children):
+        expr = HplExpression._copy(self, children)
+        expr.quantifier = self.quantifier
+        expr.variable = self.variable
+        expr._hash = self._hash
         return expr
 
     def _check_variables(self, shadow):
@@ -1316,33 +1448,46 @@ class HplQuantifier(HplExpression):
     def _check_expression_vars(self, t, shadow):
         uid = id(self)
         used = 0
-        for obj in self.condition.iterate():
-            assert obj.is_expression
+        v = self.variable
+        # only descend into subtrees that do refer to the variable
+        stack = [self.condition]
+        while stack:
+            obj = stack.pop()
+            if not obj.contains_reference(v):
+                continue
             if obj.is_value and obj.is_variable:
-                v = obj.name
-                if self.variable == v:
-                    if obj.is_defined and not shadow:
-                        assert obj.defined_at != uid
-                        raise HplSanityError(self._MULTI_DEF.format(v, self))
-                    obj.defined_at = uid
-                    self._type_check(obj, t)
-                    used += 1
+                assert obj.name == v
+                if obj.is_defined and not shadow:
+                    assert obj.defined_at != uid
+                    raise HplSanityError(self._MULTI_DEF.format(v, self))
+                obj.defined_at = uid
+                self._type_check(obj, t)
+                used += 1
+            else:
+                stack.extend(obj._children_rev)
         if not used:
             raise HplSanityError(self._UNUSED.format(self.variable, self))
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if not isinstance(other, HplQuantifier):
             return False
+        if (self._hash is not None and other._hash is not None
+                and self._hash != other._hash):
+            return False
         return (self.quantifier == other.quantifier
                 and self.variable == other.variable
                 and self.domain == other.domain
                 and self.condition == other.condition)
 
     def __hash__(self):
-        h = 31 * hash(self.quantifier) + hash(self.variable)
-        h = 31 * h + hash(self.domain)
-        h = 31 * h + hash(self.condition)
-        return h
+        if self._hash is None:
+            h = 31 * hash(self.quantifier) + hash(self.variable)
+            h = 31 * h + hash(self.domain)
+            h = 31 * h + hash(self.condition)
+            self._hash = h
+        return self._hash
 
     def __str__(self):
         return "({} {} in {}: {})".format(self.quantifier, self.variable,
@@ -1366,26 +1511,28 @@ def Exists(x, dom, phi, shadow=False):
 ###############################################################################
 
 class HplUnaryOperator(HplExpression):
-    __slots__ = HplExpression.__slots__ + ("operator", "operand")
+    __slots__ = ("operator", "_hash")
 
-    _OPS = {
+    _OPS = _intern_keys({
         "-": (T_NUM, T_NUM),
         "not": (T_BOOL, T_BOOL)
-    }
+    })
 
-    def accept(self, visitor: HplAstVisitor) -> None:
-        visitor.visit_hpl_unary_operator(self)
+    _VISIT_METHOD = "visit_hpl_unary_operator"
+
+    is_operator = True
 
     def __init__(self, op, arg):
         tin, tout = self._OPS[op]
         HplExpression.__init__(self, types=tout)
-        self.operator = op # string
-        self.operand = arg # HplExpression
+        self.operator = intern_name(op) # string
+        self._set_children((arg,)) # (HplExpression,)
+        self._hash = None
         self._type_check(arg, tin)
 
     @property
-    def is_operator(self):
-        return True
+    def operand(self):
+        return self._children[0]
 
     @property
     def arity(self):
@@ -1399,22 +1546,27 @@ class HplUnaryOperator(HplExpression):
     def a(self):
         return self.operand
 
-    def children(self):
-        return (self.operand,)
-
-    def clone(self):
-        expr = HplUnaryOperator(self.operator, self.operand.clone())
-        expr.types = self.types
+    def _copy(self, children):
+        expr = HplExpression._copy(self, children)
+        expr.operator = self.operator
+        expr._hash = self._hash
         return expr
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if not isinstance(other, HplUnaryOperator):
             return False
+        if (self._hash is not None and other._hash is not None
+                and self._hash != other._hash):
+            return False
         return (self.operator == other.operator
                 and self.operand == other.operand)
 
     def __hash__(self):
-        return 31 * hash(self.operator) + hash(self.operand)
+        if self._hash is None:
+            self._hash = 31 * hash(self.operator) + hash(self.operand)
+        return self._hash
 
     def __str__(self):
         op = self.operator
@@ -1432,11 +1584,10 @@ def Not(a):
 
 
 class HplBinaryOperator(HplExpression):
-    __slots__ = HplExpression.__slots__ + (
-        "operator", "operand1", "operand2", "infix", "commutative")
+    __slots__ = ("operator", "infix", "commutative", "_hash")
 
     # operator: (Input -> Input -> Output), infix, commutative
-    _OPS = {
+    _OPS = _intern_keys({
         "+": (T_NUM, T_NUM, T_NUM, True, True),
         "-": (T_NUM, T_NUM, T_NUM, True, False),
         "*": (T_NUM, T_NUM, T_NUM, True, True),
@@ -1453,25 +1604,30 @@ class HplBinaryOperator(HplExpression):
         ">": (T_NUM, T_NUM, T_BOOL, True, False),
         ">=": (T_NUM, T_NUM, T_BOOL, True, False),
         "in": (T_PRIM, T_SET | T_RAN, T_BOOL, True, False),
-    }
+    })
 
-    def accept(self, visitor: HplAstVisitor) -> None:
-        visitor.visit_hpl_binary_operator(self)
+    _VISIT_METHOD = "visit_hpl_binary_operator"
+
+    is_operator = True
 
     def __init__(self, op, arg1, arg2):
         tin1, tin2, tout, infix, comm = self._OPS[op]
         HplExpression.__init__(self, types=tout)
-        self.operator = op # string
-        self.operand1 = arg1 # HplExpression
-        self.operand2 = arg2 # HplExpression
+        self.operator = intern_name(op) # string
         self.infix = infix # bool
         self.commutative = comm # bool
+        self._set_children((arg1, arg2)) # (HplExpression, HplExpression)
+        self._hash = None
         self._type_check(arg1, tin1)
         self._type_check(arg2, tin2)
 
     @property
-    def is_operator(self):
-        return True
+    def operand1(self):
+        return self._children[0]
+
+    @property
+    def operand2(self):
+        return self._children[1]
 
     @property
     def arity(self):
@@ -1489,18 +1645,22 @@ class HplBinaryOperator(HplExpression):
     def b(self):
         return self.operand2
 
-    def children(self):
-        return (self.operand1, self.operand2)
-
-    def clone(self):
-        expr = HplBinaryOperator(self.operator, self.operand1.clone(),
-                                 self.operand2.clone())
-        expr.types = self.types
+    def _copy(self, children):
+        expr = HplExpression._copy(self, children)
+        expr.operator = self.operator
+        expr.infix = self.infix
+        expr.commutative = self.commutative
+        expr._hash = self._hash
         return expr
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if not isinstance(other, HplBinaryOperator):
             return False
+        if (self._hash is not None and other._hash is not None
+                and self._hash != other._hash):
+            return False
         if self.operator != other.operator:
             return False
         a = self.operand1
@@ -1512,9 +1672,16 @@ class HplBinaryOperator(HplExpression):
         return a == x and b == y
 
     def __hash__(self):
-        h = 31 * hash(self.operator) + hash(self.operand1)
-        h = 31 * h + hash(self.operand2)
-        return h
+        if self._hash is None:
+            h1 = hash(self.operand1)
+            h2 = hash(self.operand2)
+            if self.commutative:
+                # must agree with `__eq__`, which ignores operand order
+                h = 31 * hash(self.operator) + (h1 ^ h2)
+            else:
+                h = 31 * (31 * hash(self.operator) + h1) + h2
+            self._hash = h
+        return self._hash
 
     def __str__(self):
         a = str(self.operand1)
@@ -1530,17 +1697,70 @@ class HplBinaryOperator(HplExpression):
             repr(self.operand1), repr(self.operand2))
 
 
+class HplBinaryConnective(HplBinaryOperator):
+    # boolean operators, (T_BOOL -> T_BOOL -> T_BOOL), infix;
+    # subclasses fix the operator, which is still stored in the slots
+    __slots__ = ()
+
+    _OPERATOR = None # string, set by subclasses
+    _COMMUTATIVE = False # set by subclasses
+
+    def __init__(self, arg1, arg2):
+        HplExpression.__init__(self, types=T_BOOL)
+        self.operator = self._OPERATOR # string
+        self.infix = True # bool
+        self.commutative = self._COMMUTATIVE # bool
+        self._set_children((arg1, arg2)) # (HplExpression, HplExpression)
+        self._hash = None
+        self._type_check(arg1, T_BOOL)
+        self._type_check(arg2, T_BOOL)
+
+    def __repr__(self):
+        return "{}({}, {})".format(
+            type(self).__name__, repr(self.operand1), repr(self.operand2))
+
+
+class HplAnd(HplBinaryConnective):
+    __slots__ = ()
+    _OPERATOR = "and"
+    _COMMUTATIVE = True
+
+
+class HplOr(HplBinaryConnective):
+    __slots__ = ()
+    _OPERATOR = "or"
+    _COMMUTATIVE = True
+
+
+class HplImplies(HplBinaryConnective):
+    __slots__ = ()
+    _OPERATOR = "implies"
+    _COMMUTATIVE = False
+
+
+class HplIff(HplBinaryConnective):
+    __slots__ = ()
+    _OPERATOR = "iff"
+    _COMMUTATIVE = True
+
+
+# operator -> HplBinaryConnective subclass
+CONNECTIVES = {
+    cls._OPERATOR: cls for cls in (HplAnd, HplOr, HplImplies, HplIff)
+}
+
+
 def And(a, b):
-    return HplBinaryOperator("and", a, b)
+    return HplAnd(a, b)
 
 def Or(a, b):
-    return HplBinaryOperator("or", a, b)
+    return HplOr(a, b)
 
 def Implies(a, b):
-    return HplBinaryOperator("implies", a, b)
+    return HplImplies(a, b)
 
 def Iff(a, b):
-    return HplBinaryOperator("iff", a, b)
+    return HplIff(a, b)
 
 
 FunctionType = namedtuple("FunctionType", ("params", "output"))
@@ -1552,14 +1772,73 @@ def F(*args):
     params = Parameters(tuple(args[:-1]), False)
     return FunctionType((params,), args[-1])
 
+def _params_matcher(params):
+    # -> matcher(args) returning narrowed argument types, or None
+    types = params.types
+    nparams = len(types)
+    if params.var_args:
+        last = types[-1]
+        def match(args):
+            nargs = len(args)
+            if nargs < nparams:
+                return None
+            # repeat the last type indefinitely
+            ts = types + (last,) * (nargs - nparams)
+            narrowed = []
+            for arg, t in zip(args, ts):
+                r = arg.types & t
+                if not r:
+                    return None
+                narrowed.append(r)
+            return narrowed
+    elif nparams == 1:
+        t0 = types[0]
+        def match(args):
+            if len(args) != 1:
+                return None
+            r = args[0].types & t0
+            return (r,) if r else None
+    elif nparams == 2:
+        t0, t1 = types
+        def match(args):
+            if len(args) != 2:
+                return None
+            r0 = args[0].types & t0
+            r1 = args[1].types & t1
+            return (r0, r1) if r0 and r1 else None
+    else:
+        def match(args):
+            if len(args) != nparams:
+                return None
+            narrowed = []
+            for arg, t in zip(args, types):
+                r = arg.types & t
+                if not r:
+                    return None
+                narrowed.append(r)
+            return narrowed
+    return match
+
+def _function_matcher(function_type):
+    matchers = tuple(_params_matcher(p) for p in function_type.params)
+    if len(matchers) == 1:
+        return matchers[0]
+    def match(args):
+        for matcher in matchers:
+            types = matcher(args)
+            if types is not None:
+                return types
+        return None
+    return match
+
 
 class HplFunctionCall(HplExpression):
-    __slots__ = HplExpression.__slots__ + ("function", "arguments",)
+    __slots__ = ("function", "_hash")
 
     _SIG = "function '{}' expects {}, but got {}."
 
     # name: Input -> Output
-    _BUILTINS = {
+    _BUILTINS = _intern_keys({
         "abs":   F(T_NUM, T_NUM),
         "bool":  F(T_PRIM, T_BOOL),
         "int":   F(T_PRIM, T_NUM),
@@ -1614,10 +1893,16 @@ class HplFunctionCall(HplExpression):
              Parameters((T_NUM, T_NUM, T_NUM, T_NUM), False)),
             T_NUM
         ),
+    })
+
+    # name: matcher(args) -> narrowed argument types, or None
+    _MATCHERS = {
+        fun: _function_matcher(ftype) for fun, ftype in _BUILTINS.items()
     }
 
-    def accept(self, visitor: HplAstVisitor) -> None:
-        visitor.visit_hpl_functional_call(self)
+    _VISIT_METHOD = "visit_hpl_functional_call"
+
+    is_function_call = True
 
     def __init__(self, fun, args):
         try:
@@ -1625,77 +1910,32 @@ class HplFunctionCall(HplExpression):
         except KeyError:
             raise HplTypeError("undefined function '{}'".format(fun))
         HplExpression.__init__(self, types=function_type.output)
-        self.function = fun # string
-        self.arguments = args # [HplValue]
+        self.function = intern_name(fun) # string
+        self._set_children(tuple(args)) # (HplValue)
+        self._hash = None
         self._type_check_args(function_type)
 
     @property
-    def is_function_call(self):
-        return True
+    def arguments(self):
+        return self._children
 
     @property
     def arity(self):
-        return len(self.arguments)
-
-    def children(self):
-        return self.arguments
+        return len(self._children)
 
-    def clone(self):
-        expr = HplFunctionCall(self.function,
-                               tuple(a.clone() for a in self.arguments))
-        expr.types = self.types
+    def _copy(self, children):
+        expr = HplExpression._copy(self, children)
+        expr.function = self.function
+        expr._hash = self._hash
         return expr
 
     def _type_check_args(self, function_type):
-        args = self.arguments
-        nargs = len(args)
-        for params in function_type.params:
-            if params.var_args:
-                if self._match_with_var_args(params):
-                    return True
-            else:
-                if self._match_normal(params):
-                    return True
-        raise HplTypeError(self._error_msg(function_type.params))
-
-    def _match_with_var_args(self, params):
-        args = self.arguments
-        nargs = len(args)
-        nparams = len(params.types)
-        if nargs < nparams:
-            return False
-        for i in range(nparams):
-            t = params.types[i]
-            if not args[i].can_be(t):
-                return False
-        # repeat the last type indefinitely
-        for i in range(nparams, nargs):
-            t = params.types[-1]
-            if not args[i].can_be(t):
-                return False
+        types = self._MATCHERS[self.function](self.arguments)
+        if types is None:
+            raise HplTypeError(self._error_msg(function_type.params))
         # by this point, everything matches; commit the changes
-        for i in range(nparams):
-            t = params.types[i]
-            self._type_check(args[i], t)
-        for i in range(nparams, nargs):
-            t = params.types[-1]
-            self._type_check(args[i], t)
-        return True
-
-    def _match_normal(self, params):
-        args = self.arguments
-        nargs = len(args)
-        nparams = len(params.types)
-        if nargs != nparams:
-            return False
-        for i in range(nparams):
-            t = params.types[i]
-            if not args[i].can_be(t):
-                return False
-        # by this point, everything matches; commit the changes
-        for i in range(nparams):
-            t = params.types[i]
-            self._type_check(args[i], t)
+        for arg, t in zip(self.arguments, types):
+            arg.types = t
         return True
 
     def _error_msg(self, overloads):
@@ -1712,13 +1952,23 @@ class HplFunctionCall(HplExpression):
         return self._SIG.format(self.function, sigs, args)
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if not isinstance(other, HplFunctionCall):
             return False
+        if (self._hash is not None and other._hash is not None
+                and self._hash != other._hash):
+            return False
         return (self.function == other.function
                 and self.arguments == other.arguments)
 
     def __hash__(self):
-        return 31 * hash(self.function) + hash(self.arguments)
+        if self._hash is None:
+            h = hash(self.function)
+            for arg in self.arguments:
+                h = 31 * h + hash(arg)
+            self._hash = h
+        return self._hash
 
     def __str__(self):
         return "{}({})".format(self.function,
@@ -1734,54 +1984,76 @@ class HplFunctionCall(HplExpression):
 ###############################################################################
 
 class HplFieldAccess(HplExpression):
-    __slots__ = HplExpression.__slots__ + ("message", "field", "ros_type")
+    __slots__ = ("field", "ros_type", "_hash", "_root")
 
-    def accept(self, visitor: HplAstVisitor) -> None:
-        visitor.visit_hpl_field_access(self)
+    _VISIT_METHOD = "visit_hpl_field_access"
+
+    is_accessor = True
+    is_field = True
+    is_indexed = False
 
     def __init__(self, msg, field):
         HplExpression.__init__(self, types=T_ROS)
-        self.message = msg # HplExpression
-        self.field = field # string
+        self._set_children((msg,)) # (HplExpression,)
+        self.field = intern_name(field) # string
         self.ros_type = None
+        self._hash = None
+        # innermost field access of the accessor chain
+        self._root = msg._root if msg.is_accessor else self
         self._type_check(msg, T_MSG)
 
     @property
-    def is_accessor(self):
-        return True
-
-    @property
-    def is_field(self):
-        return True
-
-    @property
-    def is_indexed(self):
-        return False
+    def message(self):
+        return self._children[0]
+
+    @message.setter
+    def message(self, msg):
+        # e.g., `replace_self_reference`; only message references
+        # (`this` message or aliases) are swapped, so `_root` and the
+        # cached `_hash` (which ignores them) stay valid, and so do the
+        # enclosing summaries, as they do not cover these messages
+        if not self._children[0].is_value:
+            raise TypeError("not a message reference: "
+                            + repr(self._children[0]))
+        if not msg.is_expression or not msg.is_value:
+            raise TypeError("not a message reference: " + repr(msg))
+        self._set_children((msg,))
 
     def base_message(self):
-        obj = self
-        while obj.is_accessor:
-            obj = obj.message
-        assert obj.is_value
-        return obj
+        # the root's message is always a reference (see `message`)
+        return self._root._children[0]
 
-    def children(self):
-        return (self.message,)
+    def _collect_references(self):
+        return (_NO_NAMES, (self,))
 
-    def clone(self):
-        expr = HplFieldAccess(self.message.clone(), self.field)
+    def _copy(self, children):
+        expr = HplExpression._copy(self, children)
+        expr.field = self.field
         expr.ros_type = self.ros_type
-        expr.types = self.types
+        expr._hash = self._hash
+        expr._root = children[0]._root if children[0].is_accessor else expr
         return expr
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if not isinstance(other, HplFieldAccess):
             return False
+        if (self._hash is not None and other._hash is not None
+                and self._hash != other._hash):
+            return False
         return (self.message == other.message
                 and self.field == other.field)
 
     def __hash__(self):
-        return 31 * hash(self.message) + hash(self.field)
+        # message references (`this` message or aliases) are replaced in
+        # place (e.g., `replace_self_reference`), so they must not affect
+        # the hash of this or any enclosing node
+        if self._hash is None:
+            msg = self.message
+            h = 0 if msg.is_value else hash(msg)
+            self._hash = 31 * h + hash(self.field)
+        return self._hash
 
     def __str__(self):
         msg = str(self.message)
@@ -1795,63 +2067,73 @@ class HplFieldAccess(HplExpression):
 
 
 class HplArrayAccess(HplExpression):
-    __slots__ = HplExpression.__slots__ + ("array", "item", "ros_type")
+    __slots__ = ("ros_type", "_hash", "_root")
 
     _MULTI_ARRAY = "multi-dimensional array access: '{}[{}]'"
 
-    def accept(self, visitor: HplAstVisitor) -> None:
-        visitor.visit_hpl_array_access(self)
+    _VISIT_METHOD = "visit_hpl_array_access"
+
+    is_accessor = True
+    is_field = False
+    is_indexed = True
 
     def __init__(self, array, index):
         if array.is_accessor and array.is_indexed:
             raise HplTypeError(self._MULTI_ARRAY.format(array, index))
         HplExpression.__init__(self, types=T_ITEM)
-        self.array = array # HplExpression
-        self.index = index # HplExpression
         self.ros_type = None
+        self._set_children((array, index)) # (HplExpression, HplExpression)
+        self._hash = None
+        # innermost field access of the accessor chain
+        self._root = array._root if array.is_accessor else None
         self._type_check(array, T_ARR)
         self._type_check(index, T_NUM)
 
     @property
-    def is_accessor(self):
-        return True
-
-    @property
-    def is_field(self):
-        return False
+    def array(self):
+        return self._children[0]
 
     @property
-    def is_indexed(self):
-        return True
+    def index(self):
+        return self._children[1]
 
     @property
     def message(self):
-        return self.array
+        return self._children[0]
 
     def base_message(self):
+        root = self._root
+        if root is not None:
+            # always a reference (see `HplFieldAccess.message`)
+            return root._children[0]
         obj = self
         while obj.is_accessor:
             obj = obj.message
         assert obj.is_value
         return obj
 
-    def children(self):
-        return (self.array, self.index)
-
-    def clone(self):
-        expr = HplArrayAccess(self.array.clone(), self.index.clone())
+    def _copy(self, children):
+        expr = HplExpression._copy(self, children)
         expr.ros_type = self.ros_type
-        expr.types = self.types
+        expr._hash = self._hash
+        expr._root = children[0]._root if children[0].is_accessor else None
         return expr
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if not isinstance(other, HplArrayAccess):
             return False
+        if (self._hash is not None and other._hash is not None
+                and self._hash != other._hash):
+            return False
         return (self.array == other.array
                 and self.index == other.index)
 
     def __hash__(self):
-        return 31 * hash(self.array) + hash(self.index)
+        if self._hash is None:
+            self._hash = 31 * hash(self.array) + hash(self.index)
+        return self._hash
 
     def __str__(self):
         return "{}[{}]".format(self.array, self.index)
@@ -1866,38 +2148,17 @@ class HplArrayAccess(HplExpression):
 ###############################################################################
 
 class HplValue(HplExpression):
-    __slots__ = HplExpression.__slots__
-
-    def accept(self, visitor: HplAstVisitor) -> None:
-        visitor.visit_hpl_value(self)
-
-    @property
-    def is_value(self):
-        return True
-
-    @property
-    def is_literal(self):
-        return False
-
-    @property
-    def is_set(self):
-        return False
-
-    @property
-    def is_range(self):
-        return False
-
-    @property
-    def is_reference(self):
-        return False
+    __slots__ = ()
 
-    @property
-    def is_variable(self):
-        return False
+    _VISIT_METHOD = "visit_hpl_value"
 
-    @property
-    def is_this_msg(self):
-        return False
+    is_value = True
+    is_set = False
+    is_range = False
+    is_literal = False
+    is_reference = False
+    is_variable = False
+    is_this_msg = False
 
 
 ###############################################################################
@@ -1905,49 +2166,61 @@ class HplValue(HplExpression):
 ###############################################################################
 
 class HplSet(HplValue):
-    __slots__ = HplValue.__slots__ + ("values",)
+    __slots__ = ("_hash", "_value_set")
 
-    def accept(self, visitor: HplAstVisitor) -> None:
-        visitor.visit_hpl_set(self)
+    _VISIT_METHOD = "visit_hpl_set"
+
+    is_set = True
 
     def __init__(self, values):
         HplValue.__init__(self, types=T_SET)
-        self.values = values  # [HplValue]
-        for value in values:
+        self._set_children(tuple(values)) # (HplValue)
+        self._hash = None
+        self._value_set = None
+        for value in self.values:
             self._type_check(value, T_PRIM)
 
     @property
-    def is_set(self):
-        return True
+    def values(self):
+        return self._children
 
     @property
     def subtypes(self):
+        # not cached: the values' types may still be narrowed
         t = 0
         for value in self.values:
             t = t | value.types
         return t
 
     def to_set(self):
-        return set(self.values)
-
-    def children(self):
-        return self.values
-
-    def clone(self):
-        expr = HplSet(tuple(v.clone() for v in self.values))
-        expr.types = self.types
+        # copying a frozenset reuses the stored hashes of its elements
+        if self._value_set is None:
+            self._value_set = frozenset(self.values)
+        return set(self._value_set)
+
+    def _copy(self, children):
+        expr = HplValue._copy(self, children)
+        expr._hash = self._hash
+        expr._value_set = None
         return expr
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if not isinstance(other, HplSet):
             return False
+        if (self._hash is not None and other._hash is not None
+                and self._hash != other._hash):
+            return False
         return self.values == other.values
 
     def __hash__(self):
-        h = 11
-        for value in self.values:
-            h = 31 * h + hash(value)
-        return h
+        if self._hash is None:
+            h = 11
+            for value in self.values:
+                h = 31 * h + hash(value)
+            self._hash = h
+        return self._hash
 
     def __str__(self):
         return "{{{}}}".format(", ".join(str(v) for v in self.values))
@@ -1957,51 +2230,58 @@ class HplSet(HplValue):
 
 
 class HplRange(HplValue):
-    __slots__ = HplValue.__slots__ + (
-        "min_value", "max_value", "exclude_min", "exclude_max")
+    __slots__ = ("exclude_min", "exclude_max", "_hash")
 
-    def accept(self, visitor: HplAstVisitor) -> None:
-        visitor.visit_hpl_range(self)
+    _VISIT_METHOD = "visit_hpl_range"
+
+    subtypes = T_NUM # ranges are always numeric
+
+    is_range = True
 
     def __init__(self, lb, ub, exc_min=False, exc_max=False):
         HplValue.__init__(self, types=T_RAN)
-        self.min_value = lb # HplValue
-        self.max_value = ub # HplValue
         self.exclude_min = exc_min # bool
         self.exclude_max = exc_max # bool
+        self._set_children((lb, ub)) # (HplValue, HplValue)
+        self._hash = None
         self._type_check(lb, T_NUM)
         self._type_check(ub, T_NUM)
 
     @property
-    def is_range(self):
-        return True
+    def min_value(self):
+        return self._children[0]
 
     @property
-    def subtypes(self):
-        return T_NUM
-
-    def children(self):
-        return (self.min_value, self.max_value)
+    def max_value(self):
+        return self._children[1]
 
-    def clone(self):
-        expr = HplRange(self.min_value.clone(), self.max_value.clone(),
-                        exc_min=self.exclude_min, exc_max=self.exclude_max)
-        expr.types = self.types
+    def _copy(self, children):
+        expr = HplValue._copy(self, children)
+        expr.exclude_min = self.exclude_min
+        expr.exclude_max = self.exclude_max
+        expr._hash = self._hash
         return expr
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if not isinstance(other, HplRange):
             return False
+        if (self._hash is not None and other._hash is not None
+                and self._hash != other._hash):
+            return False
         return (self.min_value == other.min_value
                 and self.max_value == other.max_value
                 and self.exclude_min == other.exclude_min
                 and self.exclude_max == other.exclude_max)
 
     def __hash__(self):
-        h = 31 * hash(self.min_value) + hash(self.max_value)
-        h = 31 * h + hash(self.exclude_min)
-        h = 31 * h + hash(self.exclude_max)
-        return h
+        if self._hash is None:
+            h = 31 * hash(self.min_value) + hash(self.max_value)
+            h = 31 * h + hash(self.exclude_min)
+            h = 31 * h + hash(self.exclude_max)
+            self._hash = h
+        return self._hash
 
     def __str__(self):
         lp = "![" if self.exclude_min else "["
@@ -2021,74 +2301,151 @@ class HplRange(HplValue):
 ###############################################################################
 
 class HplLiteral(HplValue):
-    __slots__ = HplValue.__slots__ + ("token", "value",)
+    __slots__ = ("token", "value", "_hash", "_repr", "__weakref__")
 
-    def accept(self, visitor: HplAstVisitor) -> None:
-        visitor.visit_hpl_literal(self)
+    _VISIT_METHOD = "visit_hpl_literal"
+
+    is_literal = True
+
+    # literals never change after construction (their type is fixed by
+    # the value, and `types` is read-only), so equal tokens and values
+    # share a single instance; `type(value)`, as `1 == 1.0 == True`
+    _INTERNED = WeakValueDictionary() # (cls, token, type, value) -> HplLiteral
+
+    # the `HplExpression.types` slot, shadowed by the property below
+    _types = HplExpression.types
+
+    def __new__(cls, token, value):
+        t = _LITERAL_TYPES.get(type(value))
+        if t is None:
+            # subclasses, e.g., parser tokens used as string values
+            if isinstance(value, basestring):
+                t = T_STR
+            elif isinstance(value, (int, float)):
+                t = T_NUM
+            else:
+                raise TypeError("not a literal: " + repr(value))
+        token = intern_name(token)
+        key = (cls, token, type(value), value)
+        obj = cls._INTERNED.get(key)
+        if obj is None:
+            obj = HplValue.__new__(cls)
+            obj._types = t # first, as the `types` setter checks against it
+            HplValue.__init__(obj, types=t)
+            obj.token = token # string
+            obj.value = value # int | long | float | bool | string
+            obj._hash = hash(token)
+            obj._repr = None
+            cls._INTERNED[key] = obj
+        return obj
 
     def __init__(self, token, value):
-        t = T_NUM
-        if value is True or value is False:
-            t = T_BOOL
-        elif isinstance(value, basestring):
-            t = T_STR
-        elif not isinstance(value, (int, float)):
-            return TypeError("not a literal: " + repr(value))
-        HplValue.__init__(self, types=t)
-        self.token = token # string
-        self.value = value # int | long | float | bool | string
+        pass # initialised (once) by `__new__`
 
     @property
-    def is_literal(self):
-        return True
+    def types(self):
+        return self._types
+
+    @types.setter
+    def types(self, t):
+        # shared instances; casts to the literal's own type are allowed
+        # (and have no effect), anything else is a type error
+        if t != self._types:
+            if not t:
+                raise HplTypeError("no types left: " + str(self))
+            raise HplTypeError("cannot change the types of a shared "
+                               "literal: " + repr(self))
+
+    def __reduce__(self):
+        # `copy` and `pickle` go through the interning constructor
+        return (type(self), (self.token, self.value))
 
     def clone(self):
-        expr = HplLiteral(self.token, self.value)
-        expr.types = self.types
-        return expr
+        return self # interned
+
+    def _copy(self, children):
+        return self # interned
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if not isinstance(other, HplLiteral):
             return False
         return self.token == other.token
 
     def __hash__(self):
-        return hash(self.token)
+        return self._hash
 
     def __str__(self):
         return self.token
 
     def __repr__(self):
-        return "{}({}, {})".format(type(self).__name__,
-            repr(self.token), repr(self.value))
+        # interned and immutable, so this never changes
+        if self._repr is None:
+            self._repr = "{}({!r}, {!r})".format(
+                type(self).__name__, self.token, self.value)
+        return self._repr
 
 
 class HplThisMessage(HplValue):
-    __slots__ = HplValue.__slots__ + ("ros_type",)
+    __slots__ = ("_ros_type", "__weakref__")
+
+    _VISIT_METHOD = "visit_hpl_this_message"
+
+    is_reference = True
+    is_this_msg = True
+
+    # all instances are equal, so there is one per ROS type;
+    # refining the type replaces the instance instead of mutating it,
+    # which is why `ros_type` and `types` are read-only
+    _INTERNED = WeakValueDictionary() # (cls, id(ros_type)) -> HplThisMessage
+
+    def __new__(cls, ros_type=None):
+        # the instance holds `ros_type`, so its `id` is not reused meanwhile
+        key = (cls, id(ros_type))
+        obj = cls._INTERNED.get(key)
+        if obj is None:
+            obj = HplValue.__new__(cls)
+            HplValue.__init__(obj, types=T_MSG)
+            obj._ros_type = ros_type
+            cls._INTERNED[key] = obj
+        return obj
 
-    def accept(self, visitor: HplAstVisitor) -> None:
-        visitor.visit_hpl_this_message(self)
-
-    def __init__(self):
-        HplValue.__init__(self, types=T_MSG)
-        self.ros_type = None
+    def __init__(self, ros_type=None):
+        pass # initialised (once) by `__new__`
 
     @property
-    def is_reference(self):
-        return True
+    def ros_type(self):
+        return self._ros_type
 
     @property
-    def is_this_msg(self):
-        return True
+    def types(self):
+        return T_MSG
+
+    @types.setter
+    def types(self, t):
+        # shared instances; casts to T_MSG are allowed (and have no effect),
+        # anything else is a type error
+        if t != T_MSG:
+            if not t:
+                raise HplTypeError("no types left: " + str(self))
+            raise HplTypeError("cannot change the types of a shared "
+                               "message reference: " + repr(self))
+
+    def __reduce__(self):
+        return (type(self), (self.ros_type,))
 
     def clone(self):
-        expr = HplThisMessage()
-        expr.ros_type = self.ros_type
-        expr.types = self.types
-        return expr
+        return self # interned
+
+    def _copy(self, children):
+        return self # interned
+
+    def contains_reference(self, alias):
+        return alias is None
 
     def __eq__(self, other):
-        return isinstance(other, HplThisMessage)
+        return self is other or isinstance(other, HplThisMessage)
 
     def __hash__(self):
         return 433494437
@@ -2101,46 +2458,48 @@ class HplThisMessage(HplValue):
 
 
 class HplVarReference(HplValue):
-    __slots__ = HplValue.__slots__ + ("token", "defined_at", "ros_type")
+    __slots__ = ("token", "defined_at", "ros_type", "_hash", "_name")
 
-    def accept(self, visitor: HplAstVisitor) -> None:
-        visitor.visit_hpl_var_reference(self)
+    _VISIT_METHOD = "visit_hpl_var_reference"
+
+    is_reference = True
+    is_variable = True
 
     def __init__(self, token):
         HplValue.__init__(self, types=T_ITEM)
-        self.token = token # string
+        self.token = intern_name(token) # string
         self.defined_at = None
         self.ros_type = None
-
-    @property
-    def is_reference(self):
-        return True
-
-    @property
-    def is_variable(self):
-        return True
+        self._hash = hash(self.token)
+        self._name = intern(self.token[1:]) # remove lead "@"
 
     @property
     def name(self):
-        return self.token[1:] # remove lead "@"
+        return self._name
 
     @property
     def is_defined(self):
         return self.defined_at is not None
 
-    def clone(self):
-        expr = HplVarReference(self.token)
+    def _copy(self, children):
+        expr = HplValue._copy(self, children)
+        expr.token = self.token
         expr.ros_type = self.ros_type
-        expr.types = self.types
+        expr.defined_at = self.defined_at # rebound by `clone`
+        expr._hash = self._hash
+        expr._name = self._name
         return expr
 
+    def _collect_references(self):
+        return (frozenset((self.name,)), ())
+
     def __eq__(self, other):
         if not isinstance(other, HplVarReference):
             return False
         return self.token == other.token
 
     def __hash__(self):
-        return hash(self.token)
+        return self._hash
 
     def __str__(self):
         return self.token
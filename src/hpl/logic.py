@@ -72,8 +72,7 @@ def replace_var_with_this(predicate_or_expression, alias):
         if obj.is_accessor:
             if obj.is_field and obj.message.is_value:
                 if obj.message.is_variable and obj.message.name == alias:
-                    msg = HplThisMessage()
-                    msg.ros_type = obj.message.ros_type
+                    msg = HplThisMessage(obj.message.ros_type)
                     obj.message = msg
                     obj._type_check(msg, T_MSG)
 
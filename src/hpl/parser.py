@@ -19,7 +19,7 @@ from .ast import (
     HplExpression, HplPredicate, HplVacuousTruth, HplQuantifier,
     HplUnaryOperator, HplBinaryOperator, HplSet, HplRange, HplLiteral,
     HplVarReference, HplFunctionCall, HplFieldAccess, HplArrayAccess,
-    HplThisMessage, HplEventDisjunction
+    HplThisMessage, HplEventDisjunction, HplAnd, HplOr, CONNECTIVES
 )
 from .grammar import PREDICATE_GRAMMAR, HPL_GRAMMAR
 from .exceptions import HplSyntaxError
@@ -171,13 +171,20 @@ class PropertyTransformer(Transformer):
         return expr
 
     def condition(self, children):
-        return self._lr_binop(children)
+        if len(children) == 3:
+            lhs, op, rhs = children
+            return CONNECTIVES[op](lhs, rhs)
+        return children[0]
 
     def disjunction(self, children):
-        return self._lr_binop(children)
+        if len(children) == 3:
+            return HplOr(children[0], children[2])
+        return children[0]
 
     def conjunction(self, children):
-        return self._lr_binop(children)
+        if len(children) == 3:
+            return HplAnd(children[0], children[2])
+        return children[0]
 
     def negation(self, children):
         op, phi = children
@@ -24,14 +24,55 @@ from .ast import (
     HplValue,
     HplVarReference
 )
-from typing import Protocol
+from typing import Iterator
 
 
-class HplAstVisitor(Protocol):
+def _visit_table():
+    # every AST node class -> name of its `visit_hpl_*` method
+    table = {}
+    stack = [HplAstObject]
+    while stack:
+        cls = stack.pop()
+        table[cls] = cls._VISIT_METHOD
+        stack.extend(cls.__subclasses__())
+    return table
+
+_VISIT_TABLE = _visit_table()
+
+
+class HplAstVisitor(object):
     """
-    This class specifies the interface all visitor instances must adhere to.
+    Base class for AST visitors.
+    Subclasses override the `visit_hpl_*` methods they are interested in;
+    `visit(node)` dispatches to the one matching the type of `node`.
     """
 
+    __slots__ = ()
+
+    # node type -> `visit_hpl_*` function, resolved once per visitor class
+    # (node classes defined elsewhere are added lazily by `visit`)
+    _dispatch = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # each subclass gets its own table,
+        # so it never inherits entries bound to its parent's methods
+        cls._dispatch = cls._dispatch_table()
+
+    @classmethod
+    def _dispatch_table(cls):
+        return {node_cls: getattr(cls, name)
+                for node_cls, name in _VISIT_TABLE.items()}
+
+    def visit(self, node: HplAstObject):
+        cls = type(node)
+        try:
+            visit = self._dispatch[cls]
+        except KeyError:
+            visit = getattr(type(self), node._VISIT_METHOD)
+            self._dispatch[cls] = visit
+        return visit(self, node)
+
     def visit_hpl_array_access(self, node: HplArrayAccess) -> None:
         """
         Use this function to visit nodes of type HplArrayAccess.
@@ -68,9 +109,9 @@ class HplAstVisitor(Protocol):
         """
         ...
 
-    def visit_hpl_expression(self, node: HplPattern) -> None:
+    def visit_hpl_expression(self, node: HplExpression) -> None:
         """
-        Use this function to visit nodes of type HplPattern.
+        Use this function to visit nodes of type HplExpression.
         """
         ...
 
@@ -92,9 +133,9 @@ class HplAstVisitor(Protocol):
         """
         ...
 
-    def visit_hpl_pattern(self, node: HplExpression) -> None:
+    def visit_hpl_pattern(self, node: HplPattern) -> None:
         """
-        Use this function to visit nodes of type HplExpression.
+        Use this function to visit nodes of type HplPattern.
         """
         ...
 
@@ -175,3 +216,35 @@ class HplAstVisitor(Protocol):
         Use this function to visit nodes of type HplVarReference.
         """
         ...
+
+HplAstVisitor._dispatch = HplAstVisitor._dispatch_table()
+
+
+def iter_preorder(root: HplAstObject) -> Iterator[HplAstObject]:
+    """
+    Yields `root` and all of its descendants, in pre-order,
+    without recursion. Same as `root.iterate()`.
+    """
+    return root.iterate()
+
+
+def walk(node: HplAstObject, visitor: HplAstVisitor) -> None:
+    """
+    Visits `node` and all of its descendants, in pre-order
+    (the order of `node.iterate()`) and without recursion.
+    Each node goes to the `visit_hpl_*` function that the class-level
+    dispatch table of `type(visitor)` holds for its type, as in
+    `visitor.visit(n)`, not through `n.accept(visitor)`, which looks the
+    method up on the visitor instance.
+    `visitor` must be an instance of `HplAstVisitor`.
+    """
+    table = visitor._dispatch
+    vtype = type(visitor)
+    for obj in node.iterate():
+        cls = type(obj)
+        try:
+            visit = table[cls]
+        except KeyError:
+            visit = getattr(vtype, obj._VISIT_METHOD)
+            table[cls] = visit
+        visit(visitor, obj)
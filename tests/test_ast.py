@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+
+# SPDX-License-Identifier: MIT
+# Copyright © 2021 André Santos
+
+
+###############################################################################
+# Imports
+###############################################################################
+
+import copy
+import logging
+import pickle
+from sys import exit
+
+from hpl.ast import (
+    HplAnd, HplFieldAccess, HplIff, HplImplies, HplLiteral, HplOr,
+    HplPredicate, HplThisMessage, HplVarReference, T_BOOL, T_MSG, T_NUM,
+    T_STR
+)
+from hpl.exceptions import HplSyntaxError, HplTypeError
+from hpl.parser import predicate_parser
+
+
+###############################################################################
+# ROS Type Tokens
+###############################################################################
+
+class RosType(object):
+    def __init__(self, name, kind, fields=None, item=None):
+        self.name = name
+        self.is_message = kind == "msg"
+        self.is_array = kind == "array"
+        self.is_number = kind == "number"
+        self.is_bool = kind == "bool"
+        self.is_string = kind == "string"
+        self.fields = fields or {}
+        self.constants = {}
+        self.type_token = item
+
+    def contains_index(self, i):
+        return True
+
+    def __str__(self):
+        return self.name
+
+INT = RosType("int32", "number")
+SUB = RosType("Sub", "msg", {"x": INT})
+MSG = RosType("Msg", "msg", {"a": SUB, "n": INT,
+                             "xs": RosType("int32[]", "array", item=INT)})
+
+
+###############################################################################
+# Test Code
+###############################################################################
+
+def test_this_message_is_read_only():
+    msg = HplThisMessage()
+    assert HplThisMessage() is msg
+    try:
+        msg.ros_type = object()
+        assert False, "shared message changed"
+    except AttributeError:
+        pass
+    for change in (lambda: msg.add_type(T_NUM), lambda: msg.rem_type(T_MSG)):
+        try:
+            change()
+            assert False, "shared message changed"
+        except HplTypeError:
+            pass
+    msg.cast(T_MSG | T_NUM)
+    assert msg.types == T_MSG
+    assert msg.ros_type is None
+
+
+def test_literal_interning():
+    a = HplLiteral("1", 1)
+    assert HplLiteral("1", 1) is a
+    b = HplLiteral("1", 1.5)
+    assert b is not a and b.value == 1.5
+    c = HplLiteral("1", True)
+    assert c is not a and c.types == T_BOOL
+    for change in (lambda: a.add_type(T_STR),
+                   lambda: a.rem_type(T_NUM),
+                   lambda: setattr(a, "types", T_NUM | T_STR)):
+        try:
+            change()
+            assert False, "shared literal changed"
+        except HplTypeError:
+            pass
+    assert a.types == T_NUM
+
+
+def test_clone_nested_quantifiers():
+    parser = predicate_parser()
+    a = parser.parse("forall x in [0 to len(a)]: exists y in {1, 2}: "
+                     "(a[@x] > @y and b[@y] < @x)")
+    b = a.clone()
+    assert a == b
+    assert hash(a) == hash(b)
+    originals = [obj for obj in a.iterate() if obj.is_quantifier]
+    copies = [obj for obj in b.iterate() if obj.is_quantifier]
+    assert len(copies) == 2
+    for q, c in zip(originals, copies):
+        assert c is not q
+        assert c.variable == q.variable
+    uids = {c.variable: id(c) for c in copies}
+    variables = [obj for obj in b.iterate()
+                 if obj.is_value and obj.is_variable]
+    assert len(variables) == 4
+    for var in variables:
+        assert var.defined_at == uids[var.name]
+    # the original tree keeps its own bindings
+    uids = {q.variable: id(q) for q in originals}
+    for obj in a.iterate():
+        if obj.is_value and obj.is_variable:
+            assert obj.defined_at == uids[obj.name]
+
+
+def test_literal_type_error():
+    for value in (None, object(), [1], {}):
+        try:
+            HplLiteral("x", value)
+            assert False, "literal from " + repr(value)
+        except TypeError:
+            pass
+
+
+def test_refine_types():
+    parser = predicate_parser()
+    phi = HplPredicate(parser.parse("a.x > n and xs[0] < 1"))
+    phi.refine_types(MSG)
+    assert phi.is_fully_typed()
+    for test_str in ("a.y > 0", "n.x > 0", "n[0] > 0", "a > 0"):
+        phi = HplPredicate(parser.parse(test_str))
+        try:
+            phi.refine_types(MSG)
+            assert False, "refined " + repr(test_str)
+        except HplTypeError:
+            pass
+
+
+def test_connective_copies():
+    parser = predicate_parser()
+    a = parser.parse("a and (b or c) and (d implies (e iff f))")
+    kinds = (HplAnd, HplOr, HplImplies, HplIff)
+    for b in (copy.copy(a), copy.deepcopy(a), pickle.loads(pickle.dumps(a))):
+        assert a == b
+        assert hash(a) == hash(b)
+        assert str(a) == str(b)
+        for x, y in zip(a.iterate(), b.iterate()):
+            assert type(x) is type(y)
+            if isinstance(x, kinds):
+                assert y.operator == x.operator
+                assert y.commutative == x.commutative
+    phi = HplPredicate(parser.parse("a")).join(HplPredicate(parser.parse("b")))
+    assert type(phi.condition) is HplAnd
+
+
+def test_syntax_error_after_connective():
+    parser = predicate_parser()
+    for test_str in ("(a and b) c", "(a or b) c", "(a implies b) c",
+                     "(a iff b) c"):
+        try:
+            parser.parse(test_str)
+            assert False, "parsed " + repr(test_str)
+        except HplSyntaxError:
+            pass
+
+
+def test_replace_message():
+    parser = predicate_parser()
+    expr = parser.parse("a.b.c > 0")
+    c = expr.operand1
+    a = c.message.message
+    h = hash(expr)
+    msg = HplVarReference("@M")
+    a.message = msg
+    assert a.message is msg
+    assert c.base_message() is msg
+    assert hash(expr) == h
+    assert str(c) == "@M.a.b.c"
+    assert expr.contains_reference("M")
+    for obj, value in ((c, HplThisMessage()), (a, HplFieldAccess(msg, "d"))):
+        try:
+            obj.message = value
+            assert False, "replaced " + repr(obj)
+        except TypeError:
+            pass
+
+
+def main():
+    logging.basicConfig(level=logging.DEBUG)
+    test_this_message_is_read_only()
+    test_literal_interning()
+    test_clone_nested_quantifiers()
+    test_literal_type_error()
+    test_refine_types()
+    test_connective_copies()
+    test_syntax_error_after_connective()
+    test_replace_message()
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+# SPDX-License-Identifier: MIT
+# Copyright © 2021 André Santos
+
+
+###############################################################################
+# Imports
+###############################################################################
+
+import logging
+from sys import exit
+
+from hpl.parser import specification_parser
+
+
+###############################################################################
+# Specification Examples
+###############################################################################
+
+SPECIFICATION = """
+globally: no topic within 1s
+globally: input causes output
+after input as M: some output {x = @M.x}
+globally: some topic {x + y > 0}
+"""
+
+ROUNDED = """
+globally: no topic within 0.9999999s
+globally: input causes output
+after input as M: some output {x = @M.x}
+globally: some topic {x + y > 0}
+"""
+
+REORDERED = """
+after input as M: some output {x = @M.x}
+globally: no topic within 1s
+globally: input causes output
+globally: some topic {y + x > 0}
+"""
+
+
+###############################################################################
+# Test Code
+###############################################################################
+
+def test_specification_hashing():
+    parser = specification_parser()
+    a = parser.parse(SPECIFICATION)
+    b = parser.parse(REORDERED)
+    c = a.clone()
+    assert a == b
+    assert a == c
+    assert hash(a) == hash(b)
+    assert hash(a) == hash(c)
+    assert len(set((a, b, c))) == 1
+    d = parser.parse(ROUNDED)
+    assert a == d
+    assert hash(a) == hash(d)
+
+
+def main():
+    logging.basicConfig(level=logging.DEBUG)
+    test_specification_hashing()
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
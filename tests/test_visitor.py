@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+# SPDX-License-Identifier: MIT
+# Copyright © 2021 André Santos
+
+
+###############################################################################
+# Imports
+###############################################################################
+
+import logging
+from sys import exit
+
+from hpl.ast import HplVarReference
+from hpl.parser import property_parser
+from hpl.visitor import HplAstVisitor, iter_preorder, walk
+
+
+###############################################################################
+# Visitor Examples
+###############################################################################
+
+PROPERTY = ("after input as M: some output "
+            "{forall i in [0 to len(a)]: (a[@i] > @M.x and b)}")
+
+
+class FieldCounter(HplAstVisitor):
+    __slots__ = ("fields", "nodes")
+
+    def __init__(self):
+        self.fields = 0
+        self.nodes = []
+
+    def visit_hpl_field_access(self, node):
+        self.fields += 1
+
+    def visit_hpl_var_reference(self, node):
+        self.nodes.append(node)
+
+
+class FieldRecorder(FieldCounter):
+    __slots__ = ()
+
+    def visit_hpl_field_access(self, node):
+        self.nodes.append(node)
+
+
+class DuckVisitor(object):
+    def __init__(self):
+        self.nodes = []
+
+    def __getattr__(self, name):
+        if not name.startswith("visit_hpl_"):
+            raise AttributeError(name)
+        return self.nodes.append
+
+
+class MyVarReference(HplVarReference):
+    __slots__ = ()
+
+
+###############################################################################
+# Test Code
+###############################################################################
+
+def test_visitor_dispatch():
+    prop = property_parser().parse(PROPERTY)
+    nodes = list(prop.iterate())
+    fields = [obj for obj in nodes if obj.is_expression and obj.is_accessor
+              and obj.is_field]
+    variables = [obj for obj in nodes if obj.is_expression
+                 and obj.is_value and obj.is_variable]
+    counter = FieldCounter()
+    recorder = FieldRecorder()
+    for obj in nodes:
+        counter.visit(obj)
+        recorder.visit(obj)
+    # subclasses do not share their parents' dispatch tables
+    assert counter.fields == len(fields)
+    assert counter.nodes == variables
+    assert recorder.fields == 0
+    assert set(map(id, recorder.nodes)) == set(map(id, fields + variables))
+    # node classes created after the visitors are resolved lazily
+    var = MyVarReference("@x")
+    counter.visit(var)
+    assert counter.nodes[-1] is var
+
+
+def test_walk_order():
+    prop = property_parser().parse(PROPERTY)
+    order = [id(obj) for obj in prop.iterate()]
+    assert [id(obj) for obj in iter_preorder(prop)] == order
+    visitor = DuckVisitor()
+    for obj in prop.iterate():
+        obj.accept(visitor)
+    assert [id(obj) for obj in visitor.nodes] == order
+    recorder = FieldRecorder()
+    walk(prop, recorder)
+    expected = [obj for obj in prop.iterate() if obj.is_expression
+                and (obj.is_accessor and obj.is_field
+                     or obj.is_value and obj.is_variable)]
+    assert [id(obj) for obj in recorder.nodes] == list(map(id, expected))
+
+
+def main():
+    logging.basicConfig(level=logging.DEBUG)
+    test_visitor_dispatch()
+    test_walk_order()
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())